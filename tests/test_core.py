@@ -0,0 +1,184 @@
+import math
+import operator
+import sys
+from dataclasses import dataclass
+
+import pytest
+
+from usymbol import (
+    Symbol,
+    evaluate,
+    memoize,
+    substitute,
+    substitute_and_evaluate,
+    to_function,
+    wrap_function,
+)
+
+
+@dataclass(frozen=True)
+class MySymbol(Symbol):
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+x = MySymbol("x")
+y = MySymbol("y")
+cos = wrap_function(math.cos)
+copysign = wrap_function(math.copysign)
+rep = wrap_function(repr)
+divmod_ = wrap_function(divmod)
+rnd = wrap_function(round)
+
+
+def test_evaluate_keeps_equal_calls_apart():
+    assert evaluate(copysign(1.0, 0.0) + copysign(1.0, -0.0)) == 0.0
+    floordiv = wrap_function(operator.floordiv)
+    assert evaluate(rep(floordiv(3, 2)) + rep(floordiv(3, 2.0))) == "11.0"
+    assert substitute_and_evaluate(rep(x // 2) + rep(x // 2.0), {x: 3}) == "11.0"
+
+
+def test_substitute_flattens_associative_operators():
+    z = MySymbol("z")
+    w = MySymbol("w")
+    assert substitute(y + z, {y: x + w}) == x + w + z
+    assert substitute(y - z, {y: x - w}).args == (x - w, z)
+
+
+def test_memoize():
+    f = memoize(x + y, {x, y})
+    assert f({x: 1, y: 2}) == 3
+    assert f({x: 1, y: 3}) == 4
+
+    f = memoize(cos(x) * y, [x, y])
+    assert f({x: 0, y: 2}) == 2
+    assert f({x: math.pi, y: 2}) == -2
+
+
+def test_memoize_kwargs():
+    def g(a, *, b):
+        return a - b
+
+    f = memoize(wrap_function(g)(x, b=y), [x, y])
+    assert f({x: 3, y: 1}) == 2
+    assert f({x: 3, y: 2}) == 1
+
+
+def test_memoize_reuses_results():
+    calls = []
+
+    def g(a):
+        calls.append(a)
+        return 2 * a
+
+    f = memoize(wrap_function(g)(x) + y, [x, y])
+    assert f({x: 1, y: 1}) == 3
+    assert f({x: 1, y: 2}) == 4
+    assert calls == [1]
+    assert f({x: 2, y: 2}) == 6
+    assert calls == [1, 2]
+
+
+def test_memoize_signed_zero():
+    f = memoize(wrap_function(math.copysign)(1.0, x), [x])
+    assert f({x: 0.0}) == 1.0
+    assert f({x: -0.0}) == -1.0
+
+
+def test_to_function_keeps_equal_calls_apart():
+    f = to_function(copysign(x, 0.0) + copysign(x, -0.0), [x], name="f")
+    assert f(1.0) == 0.0
+
+    f = to_function(rep(x // 2) + rep(x // 2.0), [x], name="f")
+    assert f(3) == "11.0"
+
+
+def test_to_function_reuses_common_subexpressions():
+    calls = []
+
+    def g(a):
+        calls.append(a)
+        return a
+
+    g = wrap_function(g)
+    f = to_function(g(x) + g(x), [x], name="f")
+    assert f(2) == 4
+    assert calls == [2]
+
+
+def test_to_function_name_collision():
+    @dataclass(frozen=True, eq=False)
+    class Dummy(Symbol):
+        name: str
+
+        __hash__ = object.__hash__
+
+        def __str__(self):
+            return self.name
+
+    with pytest.raises(ValueError):
+        to_function(Dummy("a") + Dummy("a"), [x], name="f")
+    with pytest.raises(ValueError):
+        to_function(MySymbol("a") + Dummy("a"), [x], name="f")
+    f = to_function(MySymbol("a") + MySymbol("a"), [MySymbol("a")], name="f")
+    assert f(1) == 2
+
+
+def test_to_function_deep_expression():
+    expr = x
+    for _ in range(1000):
+        expr = expr - 1
+    assert to_function(expr, [x], name="f")(0) == -1000
+
+    expr = x
+    for _ in range(1000):
+        expr = cos(expr)
+    assert to_function(expr, [x], name="f")(0) == pytest.approx(0.739085133)
+
+
+def test_to_function_operators():
+    expr = (x[0] < y) + -x[1] * divmod_(y, 3)[1] + rnd(y, ndigits=1)
+    f = to_function(expr, [x, y], name="f")
+    assert f((1, 2), 5.25) == substitute_and_evaluate(expr, {x: (1, 2), y: 5.25})
+
+
+def test_memoize_mutated_value():
+    f = memoize(x[0] + y, [x, y])
+    values = [1, 2]
+    assert f({x: values, y: 0}) == 1
+    values[0] = 10
+    assert f({x: values, y: 0}) == 10
+
+
+def test_memoize_unknown_symbol():
+    f = memoize(x + y, [x])
+    with pytest.raises(ValueError):
+        f({x: 1, y: 2})
+
+
+def test_to_function_unknown_backend():
+    with pytest.raises(ValueError):
+        to_function(x + 1, [x], name="f", backend="cython")
+
+
+def test_to_function_auto_backend_without_numba(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numba", None)  # import raises ImportError
+    f = to_function(x + 1, [x], name="f", backend="auto")
+    assert f.__code__.co_filename == "<usymbol>"
+    assert f(1) == 2
+
+
+def test_to_function_numba_backend():
+    numba = pytest.importorskip("numba")
+    f = to_function(cos(x) + 1, [x], name="f", backend="numba")
+    assert isinstance(f, numba.core.dispatcher.Dispatcher)
+    assert f(0.0) == 2.0
+
+
+def test_to_function_auto_backend_fallback():
+    pytest.importorskip("numba")
+    f = to_function(rep(x) + "!", [x], name="f", backend="auto")
+    assert f(1) == "1!"
+    assert f(2) == "2!"
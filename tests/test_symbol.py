@@ -0,0 +1,155 @@
+import abc
+import math
+import operator
+import pickle
+import weakref
+from dataclasses import dataclass
+
+import pytest
+
+from usymbol import Symbol, to_function, wrap_function, wrap_module
+from usymbol.symbol import BinaryCall, Call
+
+
+@dataclass(frozen=True)
+class MySymbol(Symbol):
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+def test_equal_symbols_are_distinct_objects():
+    assert MySymbol("x") is not MySymbol("x")
+
+
+def test_signed_zeros_are_kept():
+    x = MySymbol("x")
+    x * 0.0
+    assert math.copysign(1, (x * -0.0).args[1]) == -1
+
+
+def test_identity_equality_subclass():
+    @dataclass(frozen=True, eq=False)
+    class Dummy(Symbol):
+        name: str
+
+        __hash__ = object.__hash__
+
+        def __str__(self):
+            return self.name
+
+    a, b = Dummy("a"), Dummy("a")
+    assert a is not b
+    assert len({a, b}) == 2
+
+
+def test_abc_subclass():
+    class Abstract(Symbol, abc.ABC):
+        @abc.abstractmethod
+        def __str__(self):
+            raise NotImplementedError
+
+    class Concrete(Abstract):
+        def __str__(self):
+            return "c"
+
+    assert str(Concrete()) == "c"
+
+
+def test_pickle_resets_cached_fields():
+    x = MySymbol("x")
+    expr = x[0] + 1
+    assert str(expr) == "x[0]+1"
+    # Stale values, as if computed in another process.
+    object.__setattr__(expr, "_hash", 0)
+    object.__setattr__(expr, "_str", "stale")
+
+    loaded = pickle.loads(pickle.dumps(expr))
+    assert loaded == expr
+    assert type(loaded) is type(expr)
+    assert hash(loaded) == hash(x[0] + 1)
+    assert str(loaded) == "x[0]+1"
+
+
+def test_wrap_function_checks_arguments():
+    def f(a: int, b: list = [], *, c=lambda: None):
+        pass
+
+    wrapped = wrap_function(f)
+    assert wrapped(1, c=2) == Call(f, (1,), {"c": 2})
+    with pytest.raises(TypeError):
+        wrapped()
+    with pytest.raises(TypeError):
+        wrapped(1, 2, 3)
+    with pytest.raises(TypeError):
+        wrapped(1, d=2)
+
+
+def test_wrap_module_returns_functions():
+    m = wrap_module(math)
+    cos = m.cos
+    assert cos(1.0) == Call(math.cos, (1.0,))
+    assert cos is m.cos
+    with pytest.raises(TypeError):
+        cos(1.0, 2.0)
+
+
+def test_dataclass_subclass_of_call():
+    @dataclass(frozen=True)
+    class MyCall(Call):
+        pass
+
+    x = MySymbol("x")
+    call = MyCall(math.cos, (x,))
+    assert str(call) == "math.cos(x)"
+    assert str(call + 1) == "math.cos(x)+1"
+    assert hash(call) == hash(MyCall(math.cos, (x,)))
+
+    @dataclass(frozen=True)
+    class MyBinaryCall(BinaryCall):
+        pass
+
+    call = MyBinaryCall(operator.sub, (x, x + 1), op="-", precedence=0)
+    assert str(call) == "x-(x+1)"
+
+
+def test_calls_are_weak_referenceable():
+    x, y = MySymbol("x"), MySymbol("y")
+    expr = x + y
+    assert weakref.ref(expr)() is expr
+
+
+x, y, z = MySymbol("x"), MySymbol("y"), MySymbol("z")
+
+
+@pytest.mark.parametrize(
+    "expr, string, value",
+    [
+        ((x**2) ** y, "(x**2)**y", 64),
+        (x ** (2**y), "x**(2**y)", 256),
+        (x - (y + z), "x-(y+z)", -6),
+        ((x - y) + z, "x-y+z", 4),
+        (x - (y - z), "x-(y-z)", 4),
+        ((x < y) < z, "(x<y)<z", True),
+        (x < (y < z), "x<(y<z)", False),
+    ],
+)
+def test_binary_operator_parentheses(expr, string, value):
+    assert str(expr) == string
+    assert to_function(expr, [x, y, z], name="f")(2, 3, 5) == value
+
+
+@pytest.mark.parametrize(
+    "expr, string, value",
+    [
+        (-(x + y), "-(x+y)", -5),
+        (-x + y, "-x+y", 1),
+        (-(x**y), "-x**y", -8),
+        ((-x) ** y, "(-x)**y", -8),
+        (-(-x), "-(-x)", 2),
+    ],
+)
+def test_unary_operator_parentheses(expr, string, value):
+    assert str(expr) == string
+    assert to_function(expr, [x, y, z], name="f")(2, 3, 5) == value
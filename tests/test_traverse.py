@@ -0,0 +1,84 @@
+import abc
+from dataclasses import dataclass
+
+import pytest
+
+from usymbol.traverse import traverse
+
+
+def double(x):
+    return 2 * x if type(x) is int else x
+
+
+@dataclass(frozen=True)
+class Box:
+    value: object
+
+
+@dataclass(frozen=True)
+class Crate:
+    value: object
+
+
+def traverse_box(obj, apply):
+    return apply(type(obj)(traverse(obj.value, apply)))
+
+
+def test_register_with_annotation():
+    class Annotated(Box):
+        pass
+
+    @traverse.register
+    def _(obj: Annotated, apply):
+        return traverse_box(obj, apply)
+
+    assert traverse(Annotated(1), double) == Annotated(2)
+    assert traverse.dispatch(Annotated) is _
+
+
+def test_register_with_union_annotation():
+    class A(Box):
+        pass
+
+    class B(Crate):
+        pass
+
+    @traverse.register
+    def _(obj: A | B, apply):
+        return traverse_box(obj, apply)
+
+    assert traverse((A(1), B(2)), double) == (A(2), B(4))
+
+
+def test_register_with_argument():
+    class Factory(Box):
+        pass
+
+    class Pair(Box):
+        pass
+
+    traverse.register(Factory)(traverse_box)
+    traverse.register(Pair, traverse_box)
+    assert traverse(Factory(1), double) == Factory(2)
+    assert traverse(Pair(1), double) == Pair(2)
+
+
+def test_register_abc():
+    class Virtual(abc.ABC):
+        pass
+
+    class Concrete(Box):
+        pass
+
+    traverse.register(Virtual, traverse_box)
+    assert traverse(Concrete(1), double) == Concrete(1)
+    Virtual.register(Concrete)
+    assert traverse(Concrete(1), double) == Concrete(2)
+
+
+def test_register_invalid_annotation():
+    with pytest.raises(TypeError):
+
+        @traverse.register
+        def _(obj: "list[int]", apply):
+            pass
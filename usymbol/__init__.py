@@ -1,9 +1,17 @@
-from .core import evaluate, inspect, substitute, substitute_and_evaluate, to_function
+from .core import (
+    evaluate,
+    inspect,
+    memoize,
+    substitute,
+    substitute_and_evaluate,
+    to_function,
+)
 from .symbol import Symbol, wrap_function, wrap_module
 
 __all__ = [
     "evaluate",
     "inspect",
+    "memoize",
     "substitute",
     "substitute_and_evaluate",
     "to_function",
@@ -1,9 +1,23 @@
 from __future__ import annotations
 
-from collections import Counter, defaultdict
-from typing import Callable, Container, Mapping, Sequence
+import ast
+from collections import Counter
+from dataclasses import dataclass
+from functools import wraps
+from itertools import count
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Iterator,
+    Literal,
+    Mapping,
+    Sequence,
+)
 
-from .symbol import Call, Symbol
+from frozendict import frozendict
+
+from .symbol import BinaryCall, Call, OperatorCall, Symbol, UnaryCall
 from .traverse import traverse
 
 
@@ -14,7 +28,7 @@ def substitute(expr: Symbol, mapper: Callable | Mapping) -> Symbol:
     If mapper is a Mapping, every element is searched for in the mapping or left as is.
     """
     if isinstance(mapper, Mapping):
-        return traverse(expr, lambda x: mapper.get(x, x))
+        return traverse(expr, lambda x: mapper.get(x, x), memoize=True)
     else:
         return traverse(expr, mapper)
 
@@ -28,7 +42,7 @@ def evaluate(expr: Symbol) -> Symbol:
         else:
             return result
 
-    return traverse(expr, evaluator)
+    return traverse(expr, evaluator, memoize=True)
 
 
 def substitute_and_evaluate(expr, mapper: Callable | Mapping):
@@ -52,7 +66,104 @@ def substitute_and_evaluate(expr, mapper: Callable | Mapping):
         else:
             return result
 
-    return traverse(expr, evaluator)
+    return traverse(expr, evaluator, memoize=isinstance(mapper, Mapping))
+
+
+def _unchanged(old, new) -> bool:
+    try:
+        hash(old)
+        hash(new)
+    except TypeError:
+        # Unhashable values, such as numpy arrays, might be mutated in place.
+        return False
+    if old is new:
+        return True
+    elif type(old) is not type(new):
+        return False
+    elif isinstance(old, (float, complex)):
+        # Unlike ==, repr tells apart 0.0 and -0.0.
+        return repr(old) == repr(new)
+    try:
+        return bool(old == new)
+    except (TypeError, ValueError):
+        return False
+
+
+def memoize(
+    expr: Symbol,
+    variable_symbols: Collection[Symbol],
+) -> Callable[[Mapping], Symbol]:
+    """Returns a function that substitutes and evaluates the expression,
+    reusing the results of subexpressions from previous calls.
+
+    The returned function takes a Mapping from variable symbols to values.
+    Only subexpressions that depend on a variable whose value changed
+    since the previous call are evaluated again.
+    Unhashable values, such as numpy arrays, always count as changed.
+    Calls are assumed to be pure.
+    """
+    variable_symbols = frozenset(variable_symbols)
+    no_dependencies = frozenset()
+
+    # Collect the variables each node depends on, by id(node).
+    # Nodes are returned unchanged, so that children are visited
+    # before their parents and keep the same ids as in expr.
+    dependencies: dict[int, frozenset[Symbol]] = {}
+
+    def union(nodes) -> frozenset[Symbol]:
+        return no_dependencies.union(
+            *(dependencies.get(id(node), no_dependencies) for node in nodes)
+        )
+
+    def collect(x):
+        if isinstance(x, Call):
+            symbols = union((x.func, x.args, x.kwargs))
+        elif isinstance(x, tuple):
+            symbols = union(x)
+        elif isinstance(x, frozendict):
+            symbols = union(x.values())
+        elif isinstance(x, Symbol) and x in variable_symbols:
+            symbols = frozenset((x,))
+        else:
+            symbols = no_dependencies
+        if symbols:
+            dependencies[id(x)] = symbols
+        return x
+
+    traverse(expr, collect, memoize=True)
+
+    dependents = {s: [] for s in variable_symbols}
+    for node, symbols in dependencies.items():
+        for s in symbols:
+            dependents[s].append(node)
+
+    cache: dict[int, Any] = {}
+    previous = {s: s for s in variable_symbols}
+
+    def substitute_and_evaluate(mapper: Mapping) -> Symbol:
+        if not variable_symbols.issuperset(mapper):
+            raise ValueError(
+                "Not a variable symbol",
+                set(mapper).difference(variable_symbols),
+            )
+        for s in variable_symbols:
+            value = mapper.get(s, s)
+            if not _unchanged(previous[s], value):
+                previous[s] = value
+                for node in dependents[s]:
+                    cache.pop(node, None)
+
+        def evaluator(x):
+            if isinstance(x, Call):
+                return x.__call__()
+            elif isinstance(x, Symbol) and x in variable_symbols:
+                return previous[x]
+            else:
+                return x
+
+        return traverse(expr, evaluator, memoize=cache)
+
+    return substitute_and_evaluate
 
 
 def inspect(expr: Symbol) -> Counter:
@@ -67,65 +178,360 @@ def inspect(expr: Symbol) -> Counter:
     return counter
 
 
+_LITERALS = frozenset({int, float, complex, str, bytes, bool, type(None)})
+
+_UNARY_OPERATORS = {"+": ast.UAdd, "-": ast.USub, "~": ast.Invert}
+
+_BINARY_OPERATORS = {
+    "+": ast.Add,
+    "-": ast.Sub,
+    "*": ast.Mult,
+    "@": ast.MatMult,
+    "/": ast.Div,
+    "//": ast.FloorDiv,
+    "%": ast.Mod,
+    "**": ast.Pow,
+    "<<": ast.LShift,
+    ">>": ast.RShift,
+    "&": ast.BitAnd,
+    "^": ast.BitXor,
+    "|": ast.BitOr,
+}
+
+_COMPARISON_OPERATORS = {
+    "==": ast.Eq,
+    "!=": ast.NotEq,
+    "<": ast.Lt,
+    "<=": ast.LtE,
+    ">": ast.Gt,
+    ">=": ast.GtE,
+}
+
+
+# Compiling an AST object is limited by the recursion limit,
+# unlike compiling source code.
+_MAX_DEPTH = 100
+
+
+def _to_ast(
+    expr,
+    add_global: Callable[[object], str],
+    assign: Callable[[ast.expr], ast.expr],
+) -> ast.expr:
+    """Converts an expression into a Python AST expression.
+
+    Literals are inlined as constants,
+    and any other object is referenced by the name returned by add_global.
+    Subexpressions deeper than _MAX_DEPTH are replaced
+    by the local variable returned by assign.
+
+    Nodes are converted iteratively in post-order with an explicit stack,
+    so that deep expressions do not hit the recursion limit.
+    """
+    results: list[tuple[ast.expr, int]] = []  # (node, depth)
+    stack = [(expr, False)]
+    while stack:
+        x, exit = stack.pop()
+        if isinstance(x, Call):
+            children = (*x.args, *x.kwargs.values())
+        elif isinstance(x, tuple):
+            children = x
+        elif isinstance(x, Symbol):
+            results.append((ast.Name(str(x), ast.Load()), 1))
+            continue
+        elif type(x) in _LITERALS:
+            results.append((ast.Constant(x), 1))
+            continue
+        else:
+            results.append((ast.Name(add_global(x), ast.Load()), 1))
+            continue
+
+        if not exit:
+            stack.append((x, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        n = len(children)
+        operands = results[len(results) - n :]
+        del results[len(results) - n :]
+        if isinstance(x, Call):
+            results.append(_call_to_ast(x, operands, add_global, assign))
+        else:
+            nodes, depth = _limit_depth(operands, assign)
+            results.append((ast.Tuple(nodes, ast.Load()), depth))
+    return results[0][0]
+
+
+def _limit_depth(
+    operands: Sequence[tuple[ast.expr, int]],
+    assign: Callable[[ast.expr], ast.expr],
+) -> tuple[list[ast.expr], int]:
+    """Assigns operands reaching _MAX_DEPTH to local variables.
+
+    Returns the operands and the depth of a node containing them.
+    """
+    nodes = []
+    depth = 0
+    for node, node_depth in operands:
+        if node_depth >= _MAX_DEPTH:
+            node, node_depth = assign(node), 1
+        nodes.append(node)
+        depth = max(depth, node_depth)
+    return nodes, depth + 1
+
+
+def _call_to_ast(
+    expr: Call,
+    operands: list[tuple[ast.expr, int]],
+    add_global,
+    assign,
+) -> tuple[ast.expr, int]:
+    """Converts a Call, given its already converted args and kwargs values."""
+    if isinstance(expr, BinaryCall) and (
+        expr.op in _BINARY_OPERATORS or expr.op in _COMPARISON_OPERATORS
+    ):
+        # Flattened arguments are left-associated, as in OperatorCall.__call__.
+        left, *rest = operands
+        for right in rest:
+            (left_node, right_node), depth = _limit_depth((left, right), assign)
+            if expr.op in _BINARY_OPERATORS:
+                op = _BINARY_OPERATORS[expr.op]()
+                left = ast.BinOp(left_node, op, right_node), depth
+            else:
+                op = _COMPARISON_OPERATORS[expr.op]()
+                left = ast.Compare(left_node, [op], [right_node]), depth
+        return left
+
+    nodes, depth = _limit_depth(operands, assign)
+    if isinstance(expr, UnaryCall) and expr.op in _UNARY_OPERATORS:
+        return ast.UnaryOp(_UNARY_OPERATORS[expr.op](), nodes[0]), depth
+    elif isinstance(expr, OperatorCall) and expr.op == "{}[{}]":
+        value, item = nodes
+        return ast.Subscript(value, item, ast.Load()), depth
+
+    n = len(expr.args)
+    call = ast.Call(
+        func=ast.Name(add_global(expr.func), ast.Load()),
+        args=nodes[:n],
+        keywords=[ast.keyword(k, v) for k, v in zip(expr.kwargs, nodes[n:])],
+    )
+    return call, depth
+
+
+@dataclass(frozen=True)
+class _Temporary(Symbol):
+    """A local variable holding a subexpression in to_function."""
+
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+def _exact(value):
+    """Returns a key that is only equal for interchangeable values.
+
+    Unlike ==, it tells apart 1, 1.0 and True, and 0.0 and -0.0.
+    """
+    if isinstance(value, Symbol):
+        return value
+    elif type(value) is tuple:
+        return tuple(map(_exact, value))
+    elif isinstance(value, (float, complex)):
+        return type(value), repr(value)
+    else:
+        return type(value), value
+
+
+def _eliminate_common_subexpressions(
+    expr: Symbol,
+    names: Iterator[str],
+    inspect: Callable[[Any], Any],
+) -> tuple[list[tuple[_Temporary, Call]], Symbol]:
+    """Replaces repeated Calls by temporaries.
+
+    inspect is called on every node that is not a Call,
+    during the same traversal, and before any name is taken from names.
+
+    Returns the assignments, in evaluation order, and the resulting expression.
+    """
+    # Number every Call by value in a single bottom-up pass.
+    # As children are already replaced by temporaries,
+    # hashing each Call is shallow.
+    # The arguments are also keyed by type (see _exact),
+    # as equal Calls might still evaluate differently.
+    # Placeholder names are digits, which are never emitted.
+    numbering: dict[tuple, _Temporary] = {}
+    definitions: list[tuple[_Temporary, Call]] = []
+    references = Counter()
+
+    def count_references(x):
+        if isinstance(x, _Temporary):
+            references[x] += 1
+        return x
+
+    def number(x):
+        if not isinstance(x, Call):
+            return inspect(x)
+
+        try:
+            key = x, _exact(x.args), _exact(tuple(x.kwargs.values()))
+            return numbering[key]
+        except KeyError:
+            temporary = numbering[key] = _Temporary(str(len(definitions)))
+        except TypeError:  # unhashable arguments
+            temporary = _Temporary(str(len(definitions)))
+        traverse((x.func, x.args, x.kwargs), count_references)
+        definitions.append((temporary, x))
+        return temporary
+
+    expr = traverse(expr, number, memoize=True)
+    count_references(expr)
+
+    # Inline temporaries used only once, and name the rest.
+    inlined = {}
+
+    def inline(x):
+        if isinstance(x, _Temporary):
+            return inlined.get(x, x)
+        return x
+
+    assignments = []
+    for temporary, call in definitions:
+        call = traverse(call, inline)
+        if references[temporary] > 1:
+            inlined[temporary] = named = _Temporary(next(names))
+            assignments.append((named, call))
+        else:
+            inlined[temporary] = call
+
+    return assignments, inline(expr)
+
+
+def _numba_jit(func: Callable, *, fallback: bool) -> Callable:
+    """Compiles func with numba.njit.
+
+    If fallback is True, func is returned when numba is not installed,
+    and used instead of the compiled function if compilation fails.
+    """
+    try:
+        import numba
+    except ImportError:
+        if fallback:
+            return func
+        raise
+
+    jitted = numba.njit(func)
+    if not fallback:
+        return jitted
+
+    implementation = jitted
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal implementation
+        try:
+            return implementation(*args, **kwargs)
+        except numba.core.errors.NumbaError:
+            if implementation is func:
+                raise
+            implementation = func
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
 def to_function(
     expr: Symbol,
     parameters: Sequence[Symbol],
     *,
     name: str,
+    backend: Literal["python", "numba", "auto"] = "python",
 ) -> Callable:
-    # Find:
-    # - all functions used in Calls,
-    #   that we will need to provide in the globals dict,
-    # - all Symbols in the expression,
-    #   which will be replaced by their string representation.
-    # Then:
-    #   - check for collisions in symbol_names,
-    #   - generate unique names for the functions in the globals dict,
-    #   - replace the functions for these names in the expression.
-    symbol_names = defaultdict[str, set[Symbol]](set)
-    functions = set[Callable]()
+    """Compiles the expression into a function of the given parameters.
+
+    With backend="numba", the function is compiled with numba.njit,
+    which requires every Call in the expression to be supported by numba.
+    With backend="auto", numba is used if installed,
+    falling back to the Python function if compilation fails.
+    """
+    if backend not in ("python", "numba", "auto"):
+        raise ValueError(f"Unknown backend: {backend!r}")
+
+    # In a single traversal:
+    # - find all Symbols in the expression,
+    #   which will be replaced by their string representation,
+    #   and check for collisions in symbol_names,
+    # - replace repeated subexpressions by local variables.
+    # Then, build the function body as an AST,
+    # where functions and non-literal constants are provided
+    # in the globals dict under unique names.
+    symbol_names: dict[str, Symbol] = {}
 
     def inspect(x):
-        if isinstance(x, Call):
-            functions.add(x.func)
-        else:
-            symbol_names[str(x)].add(x)
-        return x  # return as is, we don't want to change the expression yet
-
-    def generate_unique_names(
-        used_names: Container[str],
-        requested_names: int,
-    ) -> set[str]:
-        names = set()
-        i = 0
-        while len(names) < requested_names:
-            proposed_name = f"f{i}"
-            if proposed_name not in used_names:
-                names.add(proposed_name)
-            i += 1
-        return names
-
-    traverse(expr, inspect)  # Find
-
-    collisions = {k: v for k, v in symbol_names.items() if len(v) > 1}
-    if len(collisions) > 0:
-        raise ValueError("More than one Symbol maps to the same name", collisions)
-
-    unique_names = generate_unique_names(
-        used_names=symbol_names,
-        requested_names=len(functions),
-    )
-    expr = substitute(expr, dict(zip(functions, unique_names)))  # Replace
-    globals = dict(zip(unique_names, functions))  # inverse mapping
+        if isinstance(x, Symbol) and not isinstance(x, Call):
+            symbol_name = str(x)
+            existing = symbol_names.setdefault(symbol_name, x)
+            # Compared as set elements, since == might return a Call.
+            if existing is not x and len(symbols := {existing, x}) > 1:
+                raise ValueError(
+                    "More than one Symbol maps to the same name",
+                    {symbol_name: symbols},
+                )
+        return x
+
+    # Names are only drawn once symbol_names is complete.
+    parameter_names = {str(p) for p in parameters}
+
+    def generate_unique_names(prefix: str) -> Iterator[str]:
+        for i in count():
+            candidate = f"{prefix}{i}"
+            if candidate not in symbol_names and candidate not in parameter_names:
+                yield candidate
+
+    globals = {}
+    global_names = {}  # id(obj) -> name
+    unique_names = generate_unique_names("f")
+
+    def add_global(obj) -> str:
+        try:
+            return global_names[id(obj)]
+        except KeyError:
+            global_name = global_names[id(obj)] = next(unique_names)
+            globals[global_name] = obj
+            return global_name
 
     # Compile and return the function
     sig = ",".join(map(str, parameters))
-    func_def = "\n\t".join(
-        [
-            f"def {name}({sig}):",
-            f"return {expr}",
-        ]
+    module = ast.parse(f"def {name}({sig}): pass")
+    temporary_names = generate_unique_names("_t")
+    assignments, expr = _eliminate_common_subexpressions(  # Find and replace
+        expr,
+        temporary_names,
+        inspect,
     )
+    body = []
+
+    def assign(value: ast.expr) -> ast.Name:
+        temporary_name = next(temporary_names)
+        body.append(ast.Assign([ast.Name(temporary_name, ast.Store())], value))
+        return ast.Name(temporary_name, ast.Load())
+
+    for t, call in assignments:
+        value = _to_ast(call, add_global, assign)
+        body.append(ast.Assign([ast.Name(str(t), ast.Store())], value))
+    body.append(ast.Return(_to_ast(expr, add_global, assign)))
+    module.body[0].body = body
+    # ast.fix_missing_locations is recursive, and ast.walk is not.
+    for node in ast.walk(module):
+        if "lineno" in node._attributes:
+            node.lineno = node.end_lineno = 1
+            node.col_offset = node.end_col_offset = 0
     locals = {}
-    exec(func_def, globals, locals)
-    return locals[name]
+    exec(compile(module, "<usymbol>", "exec"), globals, locals)
+    func = locals[name]
+
+    if backend == "python":
+        return func
+    else:
+        return _numba_jit(func, fallback=backend == "auto")
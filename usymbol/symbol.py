@@ -2,19 +2,21 @@ from __future__ import annotations
 
 import inspect
 import operator
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from functools import reduce
 from typing import Any, Callable, Generic, Mapping, ParamSpec, TypeVar
+from weakref import WeakValueDictionary
 
 from frozendict import frozendict
 
-from .traverse import traverse
-
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
 class Symbol:
+    # Subclasses without __slots__ still get a __dict__.
+    __slots__ = ("__weakref__",)
+
     def __str__(self):
         raise NotImplementedError
 
@@ -134,103 +136,237 @@ class Symbol:
         return BinaryCall(operator.or_, (other, self), precedence=-4, op="|")
 
 
-@dataclass(frozen=True)
+_EMPTY_KWARGS = frozendict()
+_ASSOCIATIVE = frozenset({"+", "*", "&", "|", "^", "@"})
+_COMPARISON = frozenset({"==", "!=", "<", "<=", ">", ">="})
+
+
+@dataclass(frozen=True, slots=True)
 class Call(Symbol, Generic[R]):
     func: Callable
     args: tuple = ()
-    kwargs: Mapping = frozendict()
+    kwargs: Mapping = _EMPTY_KWARGS
+    _str: str | None = field(default=None, init=False, repr=False, compare=False)
+    _hash: int | None = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        if not isinstance(self.kwargs, frozendict):
+        if not self.kwargs:
+            object.__setattr__(self, "kwargs", _EMPTY_KWARGS)
+        elif not isinstance(self.kwargs, frozendict):
             object.__setattr__(self, "kwargs", frozendict(self.kwargs))
 
+    @classmethod
+    def _raw(cls, func: Callable, args: tuple, kwargs: frozendict) -> Call:
+        """Creates a Call skipping __init__ and __post_init__.
+
+        The fields must be already normalized.
+        """
+        obj = object.__new__(cls)
+        object.__setattr__(obj, "func", func)
+        object.__setattr__(obj, "args", args)
+        object.__setattr__(obj, "kwargs", kwargs)
+        object.__setattr__(obj, "_str", None)
+        object.__setattr__(obj, "_hash", None)
+        return obj
+
+    # The cached fields are read with getattr, as dataclass subclasses
+    # without slots=True do not set them in __init__
+    # (their class-level defaults are dropped by slots=True).
+    def __hash__(self):
+        h = getattr(self, "_hash", None)
+        if h is None:
+            h = hash((self.func, self.args, self.kwargs))
+            object.__setattr__(self, "_hash", h)
+        return h
+
     def __str__(self):
-        if isinstance(self.func, str):
-            func = self.func
-        else:
-            try:
-                func = f"{self.func.__module__}.{self.func.__qualname__}"
-            except AttributeError:
-                # This works for numpy functions
-                func = f"{self.func.__class__.__module__}.{self.func.__name__}"
-        args = ", ".join(map(str, self.args))
-        return f"{func}({args})"
+        string = getattr(self, "_str", None)
+        if string is None:
+            string = _stringify(self)
+            object.__setattr__(self, "_str", string)
+        return string
+
+    def __reduce__(self):
+        # The cached fields are not pickled:
+        # hashes of functions are id-based, and differ across processes.
+        state = {f.name: getattr(self, f.name) for f in fields(self) if f.compare}
+        return _unpickle_call, (self.__class__, state)
+
+    def _tokens(self) -> list:
+        tokens = [_function_name(self.func), "("]
+        for arg in self.args:
+            tokens.append(arg)
+            tokens.append(", ")
+        if self.args:
+            tokens.pop()
+        tokens.append(")")
+        return tokens
 
     def __call__(self):
         return self.func(*self.args, **self.kwargs)
 
 
-@traverse.register
-def traverse_call(obj: Call, apply):
-    return apply(
-        obj.__class__(
-            func=traverse(obj.func, apply),
-            args=traverse(obj.args, apply),
-            kwargs=traverse(obj.kwargs, apply),
-        )
-    )
-
-
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class OperatorCall(Call):
     op: str
     precedence: int
+    _operands: tuple[tuple, ...] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
-    def __str__(self):
-        args = []
-        for arg in self.args:
-            if isinstance(arg, OperatorCall) and (
-                (arg.precedence < self.precedence) or (arg.op == self.op)
-            ):
-                args.append(f"({arg})")
-            else:
-                args.append(str(arg))
-
-        if "{}" in self.op:
-            return reduce(self.op.format, args)
+    __hash__ = Call.__hash__
+
+    @classmethod
+    def _raw(
+        cls,
+        func: Callable,
+        args: tuple,
+        kwargs: frozendict,
+        *,
+        op: str,
+        precedence: int,
+    ) -> OperatorCall:
+        obj = super(OperatorCall, cls)._raw(func, args, kwargs)
+        object.__setattr__(obj, "op", op)
+        object.__setattr__(obj, "precedence", precedence)
+        object.__setattr__(obj, "_operands", None)
+        return obj
+
+    def _needs_parentheses(self, arg, index: int) -> bool:
+        if not isinstance(arg, OperatorCall):
+            return False
+        elif arg.precedence != self.precedence:
+            return arg.precedence < self.precedence
+        else:
+            # Only the left operand of a left-associative operator
+            # can go without them (comparisons are chained in Python).
+            return index > 0 or self.op == "**" or self.op in _COMPARISON
+
+    def _parenthesized_args(self) -> tuple[tuple, ...]:
+        """Returns the args as token tuples, wrapped in parentheses if needed.
+
+        Computed on first use, as it is only needed for __str__.
+        """
+        operands = getattr(self, "_operands", None)
+        if operands is None:
+            operands = tuple(
+                ("(", arg, ")") if self._needs_parentheses(arg, index) else (arg,)
+                for index, arg in enumerate(self.args)
+            )
+            object.__setattr__(self, "_operands", operands)
+        return operands
+
+    def _tokens(self) -> list:
+        args = self._parenthesized_args()
+        tokens = []
+        if "{}" not in self.op:
+            for arg in args:
+                tokens.extend(arg)
+                tokens.append(self.op)
+            tokens.pop()
+        elif self.op.count("{}") == 2:
+            # Unrolls reduce(op.format, args)
+            start, middle, end = self.op.split("{}")
+            tokens.append(start * (len(args) - 1))
+            tokens.extend(args[0])
+            for arg in args[1:]:
+                tokens.append(middle)
+                tokens.extend(arg)
+                tokens.append(end)
         else:
-            return self.op.join(args)
+            args = ["".join(map(_stringify, arg)) for arg in args]
+            tokens.append(reduce(self.op.format, args))
+        return tokens
 
     def __call__(self):
         if len(self.args) > 2:
             return reduce(self.func, self.args)
-        return super().__call__()
-
-
-@traverse.register
-def traverse_operatorcall(obj: OperatorCall, apply):
-    return apply(
-        obj.__class__(
-            func=traverse(obj.func, apply),
-            args=traverse(obj.args, apply),
-            kwargs=traverse(obj.kwargs, apply),
-            op=obj.op,
-            precedence=obj.precedence,
-        )
-    )
+        # Zero-argument super() does not work in slotted dataclasses.
+        return Call.__call__(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UnaryCall(OperatorCall):
-    def __str__(self):
-        return f"{self.op}{self.args[0]}"
+    __hash__ = Call.__hash__
+
+    def _needs_parentheses(self, arg, index: int) -> bool:
+        return isinstance(arg, OperatorCall) and arg.precedence <= self.precedence
 
+    def _tokens(self) -> list:
+        (arg,) = self._parenthesized_args()
+        return [self.op, *arg]
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class BinaryCall(OperatorCall):
+    __hash__ = Call.__hash__
+
     def __post_init__(self):
-        match self.args:
-            case [BinaryCall() as left, right] if left.op is self.op:
-                args = (*left.args, right)
-                object.__setattr__(self, "args", args)
+        Call.__post_init__(self)
+        object.__setattr__(self, "args", _flatten(self.op, self.args))
+
 
+def _flatten(op: str, args: tuple) -> tuple:
+    """Merges (a + b) + c into a single Call with args (a, b, c)."""
+    if op in _ASSOCIATIVE and len(args) == 2:
+        left = args[0]
+        if type(left) is BinaryCall and left.op == op:
+            return left.args + args[1:]
+    return args
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class ComparisonCall(BinaryCall):
+    __hash__ = Call.__hash__
+
     def __bool__(self) -> bool:
         raise NotImplementedError  # TODO: eval to bool
 
 
+def _unpickle_call(cls: type[Call], state: dict[str, Any]) -> Call:
+    obj = object.__new__(cls)
+    for f in fields(cls):
+        value = state[f.name] if f.compare else f.default
+        object.__setattr__(obj, f.name, value)
+    return obj
+
+
+def _function_name(func) -> str:
+    if isinstance(func, str):
+        return func
+    try:
+        return f"{func.__module__}.{func.__qualname__}"
+    except AttributeError:
+        # This works for numpy functions
+        return f"{func.__class__.__module__}.{func.__name__}"
+
+
+def _stringify(expr) -> str:
+    """Builds the string of an expression.
+
+    Calls are expanded iteratively into a single list of strings,
+    which is joined once at the end.
+    Calls with an already cached string are not expanded.
+    """
+    parts = []
+    stack = [expr]
+    while stack:
+        x = stack.pop()
+        if type(x) is str:
+            parts.append(x)
+        elif type(x).__str__ is not Call.__str__:
+            parts.append(str(x))
+        elif getattr(x, "_str", None) is not None:
+            parts.append(x._str)
+        else:
+            stack.extend(reversed(x._tokens()))
+    return "".join(parts)
+
+
+# Wrapped functions, shared across Modules while any of them holds a reference.
+_wrap_cache: WeakValueDictionary[tuple[Callable, str], Callable] = WeakValueDictionary()
+
+
 def wrap_function(
     f: Callable[P, R],
     *,
@@ -243,33 +379,69 @@ def wrap_function(
         if name is None:
             name = "_"
 
+    key = (f, name)
+    try:
+        return _wrap_cache[key]
+    except KeyError:
+        pass
+    except TypeError:  # unhashable callable
+        key = None
+
     globals = dict(Call=Call, f=f)
 
-    try:
-        parameters = inspect.signature(f).parameters
-    except ValueError:
-        sig = "(*args, **kwargs)"
-    else:
-        renamed_parameters = []
-        for i, p in enumerate(parameters.values()):
-            default = f"{name}_{i}"
-            globals[default] = p.default
-            renamed_parameters.append(p.replace(default=default))
-        sig = str(inspect.Signature(renamed_parameters))
-
-    signature_checker_code = f"def signature_check{sig}: pass"
+    def signature_check(*args, **kwargs):
+        # Probing the signature is deferred until the first call,
+        # as Module wraps every function on attribute access.
+        # Then, it is replaced in the wrapper globals by the actual check.
+        check = globals["signature_check"] = _signature_check(f)
+        check(*args, **kwargs)
+
+    globals["signature_check"] = signature_check
     create_call_code = "\n\t".join(
         [
             f"def {name}(*args, **kwargs):",
-            signature_checker_code,
-            "signature_check(*args, **kwargs)",  # TODO: check issue with empty args
+            # Stripped by the compiler when running with -O.
+            "if __debug__: signature_check(*args, **kwargs)",
             "return Call(f, args, kwargs)",
         ]
     )
 
     locals = {}
     exec(create_call_code, globals, locals)
-    return locals[name]
+    wrapper = locals[name]
+    if key is not None:
+        _wrap_cache[key] = wrapper
+    return wrapper
+
+
+def _no_check(*args, **kwargs):
+    pass
+
+
+def _signature_check(f: Callable) -> Callable:
+    """Returns a function that raises TypeError if f does not accept the arguments.
+
+    A compiled function with the same signature checks the arguments
+    much faster than Signature.bind.
+    """
+    try:
+        signature = inspect.signature(f)
+    except (TypeError, ValueError):
+        return _no_check
+
+    # Only the presence of defaults matters, so they and the annotations
+    # are dropped, as their repr might not be valid code.
+    parameters = [
+        p.replace(
+            default=p.empty if p.default is p.empty else None,
+            annotation=p.empty,
+        )
+        for p in signature.parameters.values()
+    ]
+    sig = inspect.Signature(parameters)
+    namespace = {}
+    exec(f"def signature_check{sig}: pass", namespace)
+    return namespace["signature_check"]
 
 
 class Module:
@@ -278,6 +450,8 @@ class Module:
     Wrapped functions return a Call expression when called.
     """
 
+    __slots__ = ("_module", "__dict__")
+
     def __init__(self, module) -> None:
         self._module = module
 
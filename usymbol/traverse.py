@@ -1,19 +1,200 @@
-from functools import singledispatch
+from __future__ import annotations
+
+from abc import get_cache_token
+from functools import _find_impl
+from operator import is_
+from types import UnionType
+from typing import Any, Callable, Mapping, Union, get_args, get_origin, get_type_hints
 
 from frozendict import frozendict
 
+from .symbol import BinaryCall, Call, OperatorCall, _flatten
+
+_LEAF, _TUPLE, _FROZENDICT, _CALL, _CUSTOM = range(5)
+
+
+# Explicitly registered traversals, and their resolution for every type seen.
+_registry: dict[type, Callable] = {}
+_kinds: dict[type, int] = {}
+_handlers: dict[type, Callable] = {}
+# ABC registrations can change the resolution, as in functools.singledispatch.
+_abc_cache_token: object | None = None
+
+
+def traverse(obj, apply, *, memoize: bool | dict[int, Any] = False):
+    """Traverses an object applying a function to its elements.
+
+    Children are applied before their parents (post-order).
+    Types registered with `traverse.register` take over their own traversal.
+
+    If memoize is True, each physical node (by id) is traversed only once,
+    and repeated occurrences reuse the first result.
+    Only use it if apply is deterministic.
+    A dict can also be passed as the id -> result table,
+    which is updated in place and can be reused across calls.
+    The table is not passed to registered traversals,
+    so nodes inside registered types are not memoized.
+    """
+    global _abc_cache_token
+
+    if memoize is True:
+        memoize = {}
+    elif memoize is False:
+        memoize = None
+    if _abc_cache_token is not None and _abc_cache_token != get_cache_token():
+        _abc_cache_token = get_cache_token()
+        _kinds.clear()
+        _handlers.clear()
+    return _traverse(obj, apply, memoize)
+
+
+def register(cls: type | Callable, func: Callable | None = None):
+    """Registers func(obj, apply) to traverse instances of cls and its subclasses.
+
+    As with functools.singledispatch, it can be used as a decorator,
+    taking cls from the annotation of the first parameter,
+    and cls can be a union of types.
+    """
+    global _abc_cache_token
+
+    if func is None:
+        if _is_valid_dispatch_type(cls):
+            return lambda func: register(cls, func)
+        func = cls
+        cls = next(iter(get_type_hints(func).values()))
+        if not _is_valid_dispatch_type(cls):
+            raise TypeError(f"Invalid annotation for traverse.register: {cls!r}")
+    elif not _is_valid_dispatch_type(cls):
+        raise TypeError(f"Invalid first argument to traverse.register: {cls!r}")
+
+    for c in _union_members(cls):
+        _registry[c] = func
+        if _abc_cache_token is None and hasattr(c, "__abstractmethods__"):
+            _abc_cache_token = get_cache_token()
+    _kinds.clear()
+    _handlers.clear()
+    return func
+
+
+def dispatch(cls: type) -> Callable | None:
+    """Returns the function registered to traverse cls, if any."""
+    return _find_impl(cls, _registry)
+
+
+traverse.register = register
+traverse.dispatch = dispatch
+
+
+def _union_members(cls) -> tuple[type, ...]:
+    if isinstance(cls, UnionType) or get_origin(cls) is Union:
+        return get_args(cls)
+    return (cls,)
+
+
+def _is_valid_dispatch_type(cls) -> bool:
+    return all(isinstance(c, type) for c in _union_members(cls))
+
+
+def _kind(cls: type) -> int:
+    handler = dispatch(cls)
+    if handler is not None:
+        _handlers[cls] = handler
+        return _CUSTOM
+    elif issubclass(cls, tuple):
+        return _TUPLE
+    elif issubclass(cls, frozendict):
+        return _FROZENDICT
+    elif issubclass(cls, Call):
+        return _CALL
+    else:
+        return _LEAF
+
+
+def _rebuild(obj: Call, func, args, kwargs) -> Call:
+    # Skips __init__ and __post_init__, normalizing only what apply can change:
+    # kwargs replaced by a plain Mapping, and a new left operand
+    # of an associative BinaryCall, which is flattened as in __post_init__.
+    if isinstance(kwargs, Mapping) and not isinstance(kwargs, frozendict):
+        kwargs = frozendict(kwargs)
+    if not isinstance(obj, OperatorCall):
+        return obj._raw(func, args, kwargs)
+    if isinstance(obj, BinaryCall) and type(args) is tuple and len(args) == 2:
+        if args[0] is not obj.args[0]:
+            args = _flatten(obj.op, args)
+    return obj._raw(func, args, kwargs, op=obj.op, precedence=obj.precedence)
+
 
-@singledispatch
-def traverse(obj, apply):
-    """Traverses an object applying a function to its elements."""
-    return apply(obj)
+def _traverse(obj, apply, seen: dict[int, Any] | None):
+    # Iterative post-order walk with an explicit stack.
+    # Each entry is (obj, exit): on enter, the children are pushed;
+    # on exit, their results are popped and the parent is rebuilt,
+    # unless every child is unchanged (by identity).
+    kinds = _kinds
+    results = []
+    work = [(obj, False)]
+    while work:
+        obj, exit = work.pop()
+        if seen is not None and not exit and id(obj) in seen:
+            results.append(seen[id(obj)])
+            continue
 
+        cls = type(obj)
+        try:
+            kind = kinds[cls]
+        except KeyError:
+            kind = kinds[cls] = _kind(cls)
 
-@traverse.register
-def traverse_tuple(obj: tuple, apply):
-    return apply(tuple(traverse(o, apply) for o in obj))
+        if kind == _LEAF:
+            result = apply(obj)
+        elif kind == _CALL:
+            if exit:
+                func, args, kwargs = results[-3:]
+                del results[-3:]
+                if func is obj.func and args is obj.args and kwargs is obj.kwargs:
+                    result = apply(obj)
+                else:
+                    result = apply(_rebuild(obj, func, args, kwargs))
+            else:
+                work.append((obj, True))
+                work.append((obj.kwargs, False))
+                work.append((obj.args, False))
+                work.append((obj.func, False))
+                continue
+        elif kind == _TUPLE:
+            n = len(obj)
+            if exit:
+                new = results[-n:]
+                del results[-n:]
+                if all(map(is_, new, obj)):
+                    result = apply(obj)
+                else:
+                    result = apply(tuple(new))
+            elif n == 0:
+                result = apply(obj)
+            else:
+                work.append((obj, True))
+                work.extend((o, False) for o in reversed(obj))
+                continue
+        elif kind == _FROZENDICT:
+            n = len(obj)
+            if exit:
+                new = results[-n:]
+                del results[-n:]
+                if all(map(is_, new, obj.values())):
+                    result = apply(obj)
+                else:
+                    result = apply(frozendict(zip(obj.keys(), new)))
+            elif n == 0:
+                result = apply(obj)
+            else:
+                work.append((obj, True))
+                work.extend((v, False) for v in reversed(obj.values()))
+                continue
+        else:
+            result = _handlers[cls](obj, apply)
 
+        if seen is not None:
+            seen[id(obj)] = result
+        results.append(result)
 
-@traverse.register
-def traverse_frozendict(obj: frozendict, apply):
-    return apply(frozendict({k: traverse(v, apply) for k, v in obj.items()}))
+    return results[0]